@@ -143,6 +143,15 @@ def split_tracks():
                     'IDP': 4 / 11,
                     'IDF1': 2 * 4 / 20,
             },
+            'track_identity': {
+                    # Tracks are matched (0, 0) and (1, 4), the other 3 tracker tracks are unmatched.
+                    'IDTP': 2,
+                    'IDFN': 0,
+                    'IDFP': 3,
+                    'IDR': 2 / 2,
+                    'IDP': 2 / 5,
+                    'IDF1': 2 * 2 / 7,
+            },
             'vace': {
                     'STDA': 2 / 4 + 2 / 5,
                     'ATA': (2 / 4 + 2 / 5) / (0.5 * (2 + 5)),
@@ -160,6 +169,81 @@ def split_tracks():
     return data, expected
 
 
+def shared_tracker():
+    num_timesteps = 5
+    num_gt_ids = 2
+    num_tracker_ids = 2
+
+    similarity = np.zeros([num_timesteps, num_gt_ids, num_tracker_ids])
+    # Tracker 0 is the best match for both ground-truth 0 and 1.
+    similarity[:, 0, 0] = [1, 1, 0, 0, 0]
+    similarity[:, 0, 1] = [0, 0, 1, 0, 0]
+    similarity[:, 1, 0] = [0, 0, 1, 1, 0]
+    similarity[:, 1, 1] = [0, 0, 0, 0, 1]
+    gt_present = np.zeros([num_timesteps, num_gt_ids])
+    gt_present[:, 0] = [1, 1, 1, 1, 1]
+    gt_present[:, 1] = [0, 0, 1, 1, 1]
+    tracker_present = np.zeros([num_timesteps, num_tracker_ids])
+    tracker_present[:, 0] = [1, 1, 1, 1, 0]
+    tracker_present[:, 1] = [0, 0, 1, 0, 1]
+
+    expected = {
+            'identity': {
+                    'IDTP': 3,
+                    'IDFN': 5,  # 8 - 3
+                    'IDFP': 3,  # 6 - 3
+                    'IDR': 3 / 8,
+                    'IDP': 3 / 6,
+                    'IDF1': 2 * 3 / 14,
+            },
+    }
+
+    data = _from_dense(
+            num_timesteps=num_timesteps,
+            num_gt_ids=num_gt_ids,
+            num_tracker_ids=num_tracker_ids,
+            gt_present=gt_present,
+            tracker_present=tracker_present,
+            similarity=similarity,
+    )
+    return data, expected
+
+
+def sparse_matches():
+    num_timesteps = 3
+    num_gt_ids = 6
+    num_tracker_ids = 6
+
+    similarity = np.zeros([num_timesteps, num_gt_ids, num_tracker_ids])
+    # Only a few of the 36 id pairs are ever a potential match.
+    similarity[:, 0, 0] = [1, 1, 0]
+    similarity[:, 1, 0] = [0, 0, 1]
+    similarity[:, 2, 3] = [1, 0, 0]
+    gt_present = np.ones([num_timesteps, num_gt_ids])
+    tracker_present = np.ones([num_timesteps, num_tracker_ids])
+
+    expected = {
+            'identity': {
+                    'IDTP': 3,
+                    'IDFN': 15,  # 18 - 3
+                    'IDFP': 15,  # 18 - 3
+                    'IDR': 3 / 18,
+                    'IDP': 3 / 18,
+                    'IDF1': 3 / 18,
+            },
+    }
+
+    data = _from_dense(
+            num_timesteps=num_timesteps,
+            num_gt_ids=num_gt_ids,
+            num_tracker_ids=num_tracker_ids,
+            gt_present=gt_present,
+            tracker_present=tracker_present,
+            similarity=similarity,
+    )
+    return data, expected
+
+
 def _from_dense(num_timesteps, num_gt_ids, num_tracker_ids, gt_present, tracker_present, similarity):
     gt_subset = [np.flatnonzero(gt_present[t, :]) for t in range(num_timesteps)]
     tracker_subset = [np.flatnonzero(tracker_present[t, :]) for t in range(num_timesteps)]
@@ -183,6 +267,7 @@ def _from_dense(num_timesteps, num_gt_ids, num_tracker_ids, gt_present, tracker_
 METRICS_BY_NAME = {
         'clear': trackeval.metrics.CLEAR(),
         'identity': trackeval.metrics.Identity(),
+        'track_identity': trackeval.metrics.TrackIdentity(),
         'vace': trackeval.metrics.VACE(),
 }
 
@@ -190,6 +275,8 @@ SEQUENCE_BY_NAME = {
         'no_confusion': no_confusion(),
         'with_confusion': with_confusion(),
         'split_tracks': split_tracks(),
+        'shared_tracker': shared_tracker(),
+        'sparse_matches': sparse_matches(),
 }
 
 
@@ -202,7 +289,10 @@ SEQUENCE_BY_NAME = {
         ('with_confusion', 'vace'),
         ('split_tracks', 'clear'),
         ('split_tracks', 'identity'),
+        ('split_tracks', 'track_identity'),
         ('split_tracks', 'vace'),
+        ('shared_tracker', 'identity'),
+        ('sparse_matches', 'identity'),
 ])
 def test_metric(sequence_name, metric_name):
     data, expected = SEQUENCE_BY_NAME[sequence_name]
@@ -210,3 +300,27 @@ def test_metric(sequence_name, metric_name):
     result = metric.eval_sequence(data)
     for key, value in expected[metric_name].items():
         assert result[key] == pytest.approx(value), key
+
+
+@pytest.mark.parametrize('all_res,ignore_empty_classes', [
+        ({}, False),
+        ({'empty': {'IDTP': 0, 'IDFN': 0, 'IDFP': 0, 'IDF1': 1.0, 'IDR': 1.0, 'IDP': 1.0}}, True),
+])
+def test_identity_combine_no_classes(all_res, ignore_empty_classes):
+    metric = METRICS_BY_NAME['identity']
+    with np.errstate(invalid='ignore'), pytest.warns(RuntimeWarning):
+        result = metric.combine_classes_class_averaged(all_res, ignore_empty_classes=ignore_empty_classes)
+    for field in metric.integer_fields:
+        assert result[field] == 0 and isinstance(result[field], int), field
+
+
+@pytest.mark.parametrize('use_sparse_matching', [True, False])
+def test_identity_assignment(monkeypatch, use_sparse_matching):
+    if not use_sparse_matching:
+        monkeypatch.setattr(trackeval.metrics.identity, 'min_weight_full_bipartite_matching', None)
+    elif trackeval.metrics.identity.min_weight_full_bipartite_matching is None:
+        pytest.skip('min_weight_full_bipartite_matching requires scipy >= 1.6')
+    data, expected = shared_tracker()
+    result = METRICS_BY_NAME['identity'].eval_sequence(data)
+    for key, value in expected['identity'].items():
+        assert result[key] == pytest.approx(value), key
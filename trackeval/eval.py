@@ -73,8 +73,11 @@ class Evaluator:
                     # e.g. res[seq_0001][pedestrian][hota][DetA]
                     print('\nEvaluating %s\n' % tracker)
                     time_start = time.time()
-                    if config['USE_PARALLEL']:
-                        with Pool(config['NUM_PARALLEL_CORES']) as pool:
+                    # Don't start more worker processes than there are sequences or cpu cores, and run small
+                    # evaluations (a single sequence or core) in series, where starting a pool only adds overhead.
+                    num_parallel_cores = min(config['NUM_PARALLEL_CORES'], len(seq_list), os.cpu_count() or 1)
+                    if config['USE_PARALLEL'] and num_parallel_cores > 1:
+                        with Pool(num_parallel_cores) as pool:
                             _eval_sequence = partial(eval_sequence, dataset=dataset, tracker=tracker,
                                                      class_list=class_list, metrics_list=metrics_list,
                                                      metric_names=metric_names)
@@ -45,25 +45,36 @@ class HOTA(_BaseMetric):
             return res
 
         # Variables counting global association
-        potential_matches_count = np.zeros((data['num_gt_ids'], data['num_tracker_ids']))
-        gt_id_count = np.zeros((data['num_gt_ids'], 1))
-        tracker_id_count = np.zeros((1, data['num_tracker_ids']))
+        num_gt_ids = data['num_gt_ids']
+        num_tracker_ids = data['num_tracker_ids']
+
+        # Calculate the total number of dets for each gt_id and tracker_id.
+        gt_id_count = np.bincount(np.concatenate(data['gt_ids']).astype(int, copy=False),
+                                  minlength=num_gt_ids)[:, np.newaxis]
+        tracker_id_count = np.bincount(np.concatenate(data['tracker_ids']).astype(int, copy=False),
+                                       minlength=num_tracker_ids)[np.newaxis, :]
 
         # First loop through each timestep and accumulate global track information.
+        # Potential matches are collected as flat indices into the (num_gt_ids, num_tracker_ids) matrix, so that all
+        # timesteps can be accumulated with a single weighted bincount.
+        match_idx_flat = [np.zeros(0, dtype=int)]
+        match_weights = [np.zeros(0)]
         for t, (gt_ids_t, tracker_ids_t) in enumerate(zip(data['gt_ids'], data['tracker_ids'])):
             # Count the potential matches between ids in each timestep
             # These are normalised, weighted by the match similarity.
             if len(gt_ids_t) and len(tracker_ids_t):
                 similarity = data['similarity_scores'][t]
                 sim_iou_denom = similarity.sum(0)[np.newaxis, :] + similarity.sum(1)[:, np.newaxis] - similarity
-                sim_iou = np.zeros_like(similarity, dtype=potential_matches_count.dtype)
+                sim_iou = np.zeros_like(similarity, dtype=float)
                 sim_iou_mask = sim_iou_denom > 0 + np.finfo('float').eps
                 sim_iou[sim_iou_mask] = similarity[sim_iou_mask] / sim_iou_denom[sim_iou_mask]
-                potential_matches_count[gt_ids_t[:, np.newaxis].tolist(), tracker_ids_t[np.newaxis, :].tolist()] += sim_iou
-
-            # Calculate the total number of dets for each gt_id and tracker_id.
-            gt_id_count[gt_ids_t.tolist()] += 1
-            tracker_id_count[0, tracker_ids_t.tolist()] += 1
+                match_idx_t = gt_ids_t[:, np.newaxis] * num_tracker_ids + tracker_ids_t[np.newaxis, :]
+                match_idx_flat.append(match_idx_t.ravel())
+                match_weights.append(sim_iou.ravel())
+        potential_matches_count = np.bincount(np.concatenate(match_idx_flat).astype(int, copy=False),
+                                              weights=np.concatenate(match_weights),
+                                              minlength=num_gt_ids * num_tracker_ids
+                                              ).reshape(num_gt_ids, num_tracker_ids)
 
         # Calculate overall jaccard alignment score (before unique matching) between IDs
         global_alignment_score = potential_matches_count / (gt_id_count + tracker_id_count - potential_matches_count)
@@ -1,5 +1,10 @@
 import numpy as np
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix, csr_matrix
+try:
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+except ImportError:  # Only available in scipy >= 1.6
+    min_weight_full_bipartite_matching = None
 from ._base_metric import _BaseMetric
 from .. import _timing
 from .. import utils
@@ -46,45 +51,30 @@ class Identity(_BaseMetric):
             res['IDFP'] = data['num_tracker_dets']
             return self._compute_final_fields(res)
 
-        # Variables counting global association
-        potential_matches_count = np.zeros((data['num_gt_ids'], data['num_tracker_ids']))
-        gt_id_count = np.zeros(data['num_gt_ids'])
-        tracker_id_count = np.zeros(data['num_tracker_ids'])
+        # Accumulate global track information over all timesteps.
+        potential_matches_count, gt_id_count, tracker_id_count = self._accumulate_id_counts(data, self.threshold)
 
-        # First loop through each timestep and accumulate global track information.
-        for t, (gt_ids_t, tracker_ids_t) in enumerate(zip(data['gt_ids'], data['tracker_ids'])):
-            # Count the potential matches between ids in each timestep
-            matches_mask = np.greater_equal(data['similarity_scores'][t], self.threshold)
-            match_idx_gt, match_idx_tracker = np.nonzero(matches_mask)
-            potential_matches_count[gt_ids_t[match_idx_gt.tolist()].tolist(), tracker_ids_t[match_idx_tracker.tolist()].tolist()] += 1
-
-            # Calculate the total number of dets for each gt_id and tracker_id.
-            gt_id_count[gt_ids_t.tolist()] += 1
-            tracker_id_count[tracker_ids_t.tolist()] += 1
-
-        # Calculate optimal assignment cost matrix for ID metrics
-        num_gt_ids = data['num_gt_ids']
-        num_tracker_ids = data['num_tracker_ids']
-        fp_mat = np.zeros((num_gt_ids + num_tracker_ids, num_gt_ids + num_tracker_ids))
-        fn_mat = np.zeros((num_gt_ids + num_tracker_ids, num_gt_ids + num_tracker_ids))
-        fp_mat[num_gt_ids:, :num_tracker_ids] = 1e10
-        fn_mat[:num_gt_ids, num_tracker_ids:] = 1e10
-        for gt_id in range(num_gt_ids):
-            fn_mat[gt_id, :num_tracker_ids] = gt_id_count[gt_id]
-            fn_mat[gt_id, num_tracker_ids + gt_id] = gt_id_count[gt_id]
-        for tracker_id in range(num_tracker_ids):
-            fp_mat[:num_gt_ids, tracker_id] = tracker_id_count[tracker_id]
-            fp_mat[tracker_id + num_gt_ids, tracker_id] = tracker_id_count[tracker_id]
-        fn_mat[:num_gt_ids, :num_tracker_ids] -= potential_matches_count
-        fp_mat[:num_gt_ids, :num_tracker_ids] -= potential_matches_count
-
-        # Hungarian algorithm
-        match_rows, match_cols = linear_sum_assignment(fn_mat + fp_mat)
+        # The optimal assignment maximises the number of potential matches of the matched id pairs, since every
+        # unmatched gt or tracker det is a IDFN or IDFP respectively. Matching each gt_id to its best tracker_id reaches
+        # the upper bound on this, so when no tracker_id is the best match of more than one gt_id, that assignment is
+        # optimal and the Hungarian algorithm can be skipped.
+        best_tracker_ids = np.asarray(potential_matches_count.argmax(axis=1)).ravel()
+        best_matches_count = potential_matches_count.max(axis=1).toarray().ravel()
+        best_tracker_ids = best_tracker_ids[best_matches_count > 0]
+        if len(np.unique(best_tracker_ids)) == len(best_tracker_ids):
+            res['IDTP'] = int(best_matches_count.sum())
+        elif min_weight_full_bipartite_matching is not None:
+            match_rows, match_cols = self._sparse_id_assignment(potential_matches_count, gt_id_count, tracker_id_count)
+            res['IDTP'] = int(potential_matches_count[match_rows, match_cols].sum())
+        else:
+            # Hungarian algorithm on the rectangular (num_gt_ids, num_tracker_ids) matrix. Ids which are left unmatched
+            # (or matched without any potential matches) contribute all of their dets to IDFN or IDFP.
+            match_rows, match_cols = linear_sum_assignment(-potential_matches_count.toarray())
+            res['IDTP'] = int(potential_matches_count[match_rows, match_cols].sum())
 
         # Accumulate basic statistics
-        res['IDFN'] = fn_mat[match_rows, match_cols].sum().astype(np.int)
-        res['IDFP'] = fp_mat[match_rows, match_cols].sum().astype(np.int)
-        res['IDTP'] = (gt_id_count.sum() - res['IDFN']).astype(np.int)
+        res['IDFN'] = int(gt_id_count.sum()) - res['IDTP']
+        res['IDFP'] = int(tracker_id_count.sum()) - res['IDTP']
 
         # Calculate final ID scores
         res = self._compute_final_fields(res)
@@ -94,20 +84,13 @@ class Identity(_BaseMetric):
         """Combines metrics across all classes by averaging over the class values.
         If 'ignore_empty_classes' is True, then it only sums over classes with at least one gt or predicted detection.
         """
-        res = {}
-        for field in self.integer_fields:
-            if ignore_empty_classes:
-                res[field] = self._combine_sum({k: v for k, v in all_res.items()
-                                                if v['IDTP'] + v['IDFN'] + v['IDFP'] > 0 + np.finfo('float').eps},
-                                               field)
-            else:
-                res[field] = self._combine_sum({k: v for k, v in all_res.items()}, field)
-        for field in self.float_fields:
-            if ignore_empty_classes:
-                res[field] = np.mean([v[field] for v in all_res.values()
-                                      if v['IDTP'] + v['IDFN'] + v['IDFP'] > 0 + np.finfo('float').eps], axis=0)
-            else:
-                res[field] = np.mean([v[field] for v in all_res.values()], axis=0)
+        cls_res = list(all_res.values())
+        if ignore_empty_classes:
+            cls_res = [v for v in cls_res if v['IDTP'] + v['IDFN'] + v['IDFP'] > 0]
+        integer_values = np.array([[v[field] for field in self.integer_fields] for v in cls_res], dtype=int)
+        float_values = np.array([[v[field] for field in self.float_fields] for v in cls_res], dtype=float)
+        res = dict(zip(self.integer_fields, integer_values.reshape(-1, len(self.integer_fields)).sum(axis=0).tolist()))
+        res.update(zip(self.float_fields, float_values.reshape(-1, len(self.float_fields)).mean(axis=0).tolist()))
         return res
 
     def combine_classes_det_averaged(self, all_res):
@@ -126,23 +109,98 @@ class Identity(_BaseMetric):
         res = self._compute_final_fields(res)
         return res
 
+    @staticmethod
+    def _accumulate_id_counts(data, threshold):
+        """Counts the dets of each gt_id and tracker_id, and the potential matches (similarity >= threshold) of each
+        pair of ids as a sparse CSR matrix.
+        """
+        # Cached in data so Identity and TrackIdentity only accumulate the counts once per sequence. Callers must not
+        # modify the returned arrays in place.
+        cache = data.setdefault('_id_counts', {})
+        if threshold in cache:
+            return cache[threshold]
+
+        num_gt_ids = data['num_gt_ids']
+        num_tracker_ids = data['num_tracker_ids']
+
+        # Calculate the total number of dets for each gt_id and tracker_id. The ids of all timesteps are converted to a
+        # single integer array once (without a copy if they already are integers), and all later indexing uses these.
+        gt_ids = np.concatenate(data['gt_ids']).astype(int, copy=False)
+        tracker_ids = np.concatenate(data['tracker_ids']).astype(int, copy=False)
+        gt_id_count = np.bincount(gt_ids, minlength=num_gt_ids)
+        tracker_id_count = np.bincount(tracker_ids, minlength=num_tracker_ids)
+
+        # Threshold the similarity scores of all timesteps in one call, on the concatenation of the flattened
+        # per-timestep matrices. Similarity scores are thresholded in their own dtype: narrowing them (e.g. to float32)
+        # could move scores lying just below the threshold onto it.
+        match_idx = np.flatnonzero(np.concatenate([s.ravel() for s in data['similarity_scores']]) >= threshold)
+
+        # Recover the timestep of each match, and from that the gt and tracker det it is between.
+        num_gt_dets_t = np.array([len(x) for x in data['gt_ids']], dtype=int)
+        num_tracker_dets_t = np.array([len(x) for x in data['tracker_ids']], dtype=int)
+        num_scores_t = num_gt_dets_t * num_tracker_dets_t
+        match_t = np.searchsorted(np.cumsum(num_scores_t), match_idx, side='right')
+        match_idx_t = match_idx - (np.cumsum(num_scores_t) - num_scores_t)[match_t]
+        gt_dets_start_t = np.cumsum(num_gt_dets_t) - num_gt_dets_t
+        tracker_dets_start_t = np.cumsum(num_tracker_dets_t) - num_tracker_dets_t
+        match_gt_dets = gt_dets_start_t[match_t] + match_idx_t // num_tracker_dets_t[match_t]
+        match_tracker_dets = tracker_dets_start_t[match_t] + match_idx_t % num_tracker_dets_t[match_t]
+
+        # Count the potential matches between ids. If there are many matches compared to the number of id pairs they
+        # are accumulated densely with a single bincount over flat indices. Otherwise they are accumulated sparsely,
+        # with duplicate (gt_id, tracker_id) entries being summed when converting to CSR.
+        match_gt_ids = gt_ids[match_gt_dets]
+        match_tracker_ids = tracker_ids[match_tracker_dets]
+        if num_gt_ids * num_tracker_ids <= 2 * len(match_idx):
+            potential_matches_count = csr_matrix(np.bincount(match_gt_ids * num_tracker_ids + match_tracker_ids,
+                                                             minlength=num_gt_ids * num_tracker_ids
+                                                             ).reshape(num_gt_ids, num_tracker_ids))
+        else:
+            potential_matches_count = coo_matrix((np.ones(len(match_idx), dtype=int),
+                                                  (match_gt_ids, match_tracker_ids)),
+                                                 shape=(num_gt_ids, num_tracker_ids)).tocsr()
+        cache[threshold] = potential_matches_count, gt_id_count, tracker_id_count
+        return cache[threshold]
+
+    @staticmethod
+    def _sparse_id_assignment(potential_matches_count, gt_id_count, tracker_id_count):
+        """Calculates the optimal assignment between gt_ids and tracker_ids, returning the matched id pairs.
+        Only id pairs with potential matches can reduce IDFN and IDFP, so the assignment is solved as a minimum weight
+        full matching on the sparse graph of these pairs. Each id also has an edge to its own sink (i.e. being
+        unmatched), and each id pair is mirrored between the two sinks, so that a full matching always exists.
+        """
+        num_gt_ids, num_tracker_ids = potential_matches_count.shape
+        potential_matches = potential_matches_count.tocoo()
+        pair_gt_ids, pair_tracker_ids = potential_matches.row, potential_matches.col
+        gt_ids = np.arange(num_gt_ids)
+        tracker_ids = np.arange(num_tracker_ids)
+
+        # Edge costs are the resulting IDFN + IDFP. Every full matching has the same number of edges, so all costs
+        # are offset by one to keep zero cost edges from being dropped from the sparse graph.
+        rows = np.concatenate((pair_gt_ids, gt_ids, num_gt_ids + tracker_ids, num_gt_ids + pair_tracker_ids))
+        cols = np.concatenate((pair_tracker_ids, num_tracker_ids + gt_ids, tracker_ids, num_tracker_ids + pair_gt_ids))
+        costs = np.concatenate((gt_id_count[pair_gt_ids] + tracker_id_count[pair_tracker_ids]
+                                - 2 * potential_matches.data,
+                                gt_id_count, tracker_id_count, np.zeros(len(pair_gt_ids), dtype=int))) + 1
+        num_nodes = num_gt_ids + num_tracker_ids
+        match_rows, match_cols = min_weight_full_bipartite_matching(
+            csr_matrix((costs, (rows, cols)), shape=(num_nodes, num_nodes)))
+        match_mask = np.logical_and(match_rows < num_gt_ids, match_cols < num_tracker_ids)
+        return match_rows[match_mask], match_cols[match_mask]
+
     @staticmethod
     def _compute_final_fields(res):
         """Calculate sub-metric ('field') values which only depend on other sub-metric values.
         This function is used both for both per-sequence calculation, and in combining values across sequences.
         """
-        if  res['IDFN'] != 0:
-            res['IDR'] = res['IDTP'] / np.maximum(1.0, res['IDTP'] + res['IDFN'])
-        else:
-            res['IDR'] = 1
-        if res['IDFP'] != 0:
-            res['IDP'] = res['IDTP'] / np.maximum(1.0, res['IDTP'] + res['IDFP'])
-        else:
-            res['IDP'] = 1
-        if res['IDFN'] != 0 or res['IDFP'] != 0:
-            res['IDF1'] = res['IDTP'] / np.maximum(1.0, res['IDTP'] + 0.5 * res['IDFP'] + 0.5 * res['IDFN'])
-        else:
-            res['IDF1'] = 1
+        # Counts are integers, so a non-zero denominator is at least 0.5 (and at least 1 unless IDTP is zero). Scores
+        # are computed as python floats, and are 1 when there is nothing to score.
+        idr_denom = res['IDTP'] + res['IDFN']
+        idp_denom = res['IDTP'] + res['IDFP']
+        idf1_denom = res['IDTP'] + 0.5 * res['IDFP'] + 0.5 * res['IDFN']
+        res['IDR'] = float(res['IDTP'] / idr_denom) if idr_denom != 0 else 1.0
+        res['IDP'] = float(res['IDTP'] / idp_denom) if idp_denom != 0 else 1.0
+        res['IDF1'] = float(res['IDTP'] / idf1_denom) if idf1_denom != 0 else 1.0
         return res
 
 
@@ -163,40 +221,22 @@ class TrackIdentity(Identity):
             res['IDFP'] = data['num_tracker_ids']
             return res
 
-        # Variables counting global association
-        potential_matches_count = np.zeros((data['num_gt_ids'], data['num_tracker_ids']))
-        gt_id_count = np.zeros(data['num_gt_ids'])
-        tracker_id_count = np.zeros(data['num_tracker_ids'])
-
-        # First loop through each timestep and accumulate global track information.
-        for t, (gt_ids_t, tracker_ids_t) in enumerate(zip(data['gt_ids'], data['tracker_ids'])):
-            # Count the potential matches between ids in each timestep
-            matches_mask = np.greater_equal(data['similarity_scores'][t], self.threshold)
-            match_idx_gt, match_idx_tracker = np.nonzero(matches_mask)
-            potential_matches_count[gt_ids_t[match_idx_gt.tolist()].tolist(), tracker_ids_t[match_idx_tracker.tolist()].tolist()] += 1
-
-            # Calculate the total number of dets for each gt_id and tracker_id.
-            gt_id_count[gt_ids_t.tolist()] += 1
-            tracker_id_count[tracker_ids_t.tolist()] += 1
-
-        # Calculate optimal assignment cost matrix for ID metrics
         num_gt_ids = data['num_gt_ids']
         num_tracker_ids = data['num_tracker_ids']
-        fp_mat = np.zeros((num_gt_ids + num_tracker_ids, num_gt_ids + num_tracker_ids))
-        fn_mat = np.zeros((num_gt_ids + num_tracker_ids, num_gt_ids + num_tracker_ids))
-        fp_mat[num_gt_ids:, :num_tracker_ids] = 1
-        fn_mat[:num_gt_ids, num_tracker_ids:] = 1
-        for gt_id in range(num_gt_ids):
-            fn_mat[gt_id, :num_tracker_ids] = gt_id_count[gt_id]
-            fn_mat[gt_id, num_tracker_ids + gt_id] = 1.0 - 1e-6
-        for tracker_id in range(num_tracker_ids):
-            fp_mat[:num_gt_ids, tracker_id] = tracker_id_count[tracker_id]
-            fp_mat[tracker_id + num_gt_ids, tracker_id] = 1.0 - 1e-6
-        fn_mat[:num_gt_ids, :num_tracker_ids] -= potential_matches_count
-        fp_mat[:num_gt_ids, :num_tracker_ids] -= potential_matches_count
-        cost_matrix = fn_mat + fp_mat
-        cost_matrix[:num_gt_ids, :num_tracker_ids] /= (cost_matrix[:num_gt_ids, :num_tracker_ids] + potential_matches_count)
-        cost_matrix[num_gt_ids:, num_tracker_ids:] = 1
+
+        # Accumulate global track information over all timesteps. The cost matrix below is dense, so the potential
+        # matches are too.
+        potential_matches_count, gt_id_count, tracker_id_count = self._accumulate_id_counts(data, self.threshold)
+        potential_matches_count = potential_matches_count.toarray()
+
+        # Calculate optimal assignment cost matrix for ID metrics. Matching a gt_id and tracker_id costs their
+        # (IDFN + IDFP) / (IDTP + IDFN + IDFP), while matching an id to its own sink (leaving it unmatched) costs
+        # slightly less than one.
+        cost_matrix = np.ones((num_gt_ids + num_tracker_ids, num_gt_ids + num_tracker_ids))
+        np.fill_diagonal(cost_matrix[:num_gt_ids, num_tracker_ids:], 1.0 - 1e-6)
+        np.fill_diagonal(cost_matrix[num_gt_ids:, :num_tracker_ids], 1.0 - 1e-6)
+        fn_fp_count = gt_id_count[:, np.newaxis] + tracker_id_count[np.newaxis, :] - 2 * potential_matches_count
+        cost_matrix[:num_gt_ids, :num_tracker_ids] = fn_fp_count / (fn_fp_count + potential_matches_count)
 
         # Hungarian algorithm for IDF1
         match_rows, match_cols = linear_sum_assignment(cost_matrix)
@@ -206,10 +246,12 @@ class TrackIdentity(Identity):
                                                                    match_cols[match_mask]] /
                                            tracker_id_count[match_cols[match_mask]],
                                            self.track_iou_threshold))  # relative to predicted track length intersection
-        # Hungarian algorithm for track_IDF1
-        res['IDFN'] = np.sum(np.logical_and(match_rows < num_gt_ids, match_cols >= num_tracker_ids)).astype(np.int) + re_assigned
-        res['IDFP'] = np.sum(np.logical_and(match_rows >= num_gt_ids, match_cols < num_tracker_ids)).astype(np.int) + re_assigned  # sent to sink pred tracks counts as FP
-        res['IDTP'] = (num_gt_ids - res['IDFN']).astype(np.int)
+        # Hungarian algorithm for track_IDF1. Every gt_id and tracker_id which isn't matched to the other is matched
+        # to a sink, and sent to sink pred tracks count as FP.
+        num_matches = np.sum(match_mask)
+        res['IDFN'] = int(num_gt_ids - num_matches + re_assigned)
+        res['IDFP'] = int(num_tracker_ids - num_matches + re_assigned)
+        res['IDTP'] = num_gt_ids - res['IDFN']
 
         # Calculate final ID scores
         res = self._compute_final_fields(res)
@@ -48,13 +48,17 @@ class VACE(_BaseMetric):
         tracker_id_count = np.zeros(data['num_tracker_ids'])
         both_present_count = np.zeros((data['num_gt_ids'], data['num_tracker_ids']))
         for t, (gt_ids_t, tracker_ids_t) in enumerate(zip(data['gt_ids'], data['tracker_ids'])):
+            # Count the number of frames in which the tracks are present.
+            gt_id_count[gt_ids_t] += 1
+            tracker_id_count[tracker_ids_t] += 1
+            # Skip timesteps without any gt or tracker dets (common at sequence boundaries), where no pair of tracks
+            # can be present together or overlap.
+            if len(gt_ids_t) == 0 or len(tracker_ids_t) == 0:
+                continue
             # Count the number of frames in which two tracks satisfy the overlap criterion.
             matches_mask = np.greater_equal(data['similarity_scores'][t], self.threshold)
             match_idx_gt, match_idx_tracker = np.nonzero(matches_mask)
             potential_matches_count[gt_ids_t[match_idx_gt], tracker_ids_t[match_idx_tracker]] += 1
-            # Count the number of frames in which the tracks are present.
-            gt_id_count[gt_ids_t] += 1
-            tracker_id_count[tracker_ids_t] += 1
             both_present_count[gt_ids_t[:, np.newaxis], tracker_ids_t[np.newaxis, :]] += 1
         # Number of frames in which either track is present (union of the two sets of frames).
         union_count = (gt_id_count[:, np.newaxis]